@@ -1,6 +1,8 @@
 import modularconfig.loaders
+from modularconfig.loaders import set_content_cache
 from modularconfig.config_manager import \
     get, \
     set_config_directory, using_config_directory, get_config_directory, \
-    ensure
+    ensure, \
+    set_disk_cache
 from modularconfig.errors import *
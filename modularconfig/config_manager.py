@@ -1,10 +1,21 @@
+import os
+import pickle
 from contextlib import contextmanager
+from functools import lru_cache
+from hashlib import sha1
+from io import DEFAULT_BUFFER_SIZE
 from logging import getLogger
+from mmap import mmap, ACCESS_READ
+from os import replace, remove, stat, getcwd, fspath
+from os.path import dirname, join, realpath, expanduser
 from pathlib import Path, PurePath
-from typing import Dict, Iterator, Union, overload, Set, List
+from stat import S_ISDIR, S_ISREG
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from typing import Dict, Iterator, Union, overload, Set, Tuple, List
 
 from modularconfig.errors import ConfigNotFoundError, ConfigFileNotFoundError
-from modularconfig.loaders import load_file
+from modularconfig.loaders import load_bytes, loaders_signature
 
 logger = getLogger(__name__)
 
@@ -13,10 +24,23 @@ logger = getLogger(__name__)
 _common_configs_path: Union[Path, None] = None
 _configs: Union[Dict[str, object], None] = None
 
-_loaded_paths: Set[Path] = set()
+_loaded_paths: Set[str] = set()
+# the configs already returned by get(), by absolute path: asking them again is a single lookup
+_got_configs: Dict[str, object] = {}
+# the paths in _got_configs, by the file (or directory) containing them, to forget them when it's reloaded
+_got_by_file: Dict[str, List[str]] = {}
+
+# guarding the tree from concurrent merges, the files are parsed without holding it
+_load_lock = Lock()
 
 # config base directory
-_config_directory: Path = Path.cwd()
+_config_directory: str = getcwd()  # kept as a string, path objects are slow to build
+
+# compiled configs cache, saved in a dedicated directory outside of the config trees
+_disk_cache: bool = False
+_cache_directory: Union[str, None] = None
+_unwritable_cache_directories: Set[str] = set()  # already warned about, no more writes are tried there
+_cache_suffix = ".mcache"
 
 
 # --- Path Management ---
@@ -42,14 +66,25 @@ def _split_real_file(config: PurePath) -> Path:
     ...     except ConfigFileNotFoundError:
     ...         print(True)
     True
+
+    The results are cached: the file system is inspected again only after a reload or a config directory change
     """
-    existing_file = Path(config)
-    if existing_file.exists() and existing_file.is_dir():
-        return existing_file
-    while not existing_file.exists():  # until we don't find a true file, or directory
-        existing_file = existing_file.parent
-    if existing_file.is_file():
-        return existing_file
+    return _find_real_file(str(config))
+
+
+@lru_cache(maxsize=2048)
+def _find_real_file(config: str) -> Path:
+    """Memoized implementation of _split_real_file"""
+    existing_file = config
+    while True:  # until we don't find a true file, or directory
+        try:
+            mode = stat(existing_file).st_mode  # a single syscall for each level
+        except (FileNotFoundError, NotADirectoryError):
+            existing_file = dirname(existing_file)
+        else:
+            break
+    if S_ISREG(mode) or (S_ISDIR(mode) and existing_file == config):
+        return Path(existing_file)
     raise ConfigFileNotFoundError(f"{config} do not refer to any file")
 
 
@@ -63,9 +98,14 @@ def _split_config_attributes(config: PurePath) -> PurePath:
     return config.relative_to(_common_configs_path)
 
 
-def _relative_to_config_directory(config):
-    config = _config_directory.joinpath(config).resolve()  # make it relative to the prefix (still permit absolutes)
-    return config
+def _relative_to_config_directory(config: Union[str, PurePath]) -> Path:
+    # make it relative to the prefix (still permit absolutes)
+    return Path(_resolve_config(config))
+
+
+def _resolve_config(config: Union[str, PurePath]) -> str:
+    """Absolute path of the config, as a string"""
+    return realpath(join(_config_directory, fspath(config)))
 
 
 @overload
@@ -111,6 +151,95 @@ def _rebase(new_common_config_path: Path) -> None:
 
 # --- File Loading ---
 
+def _parents(path: str) -> Iterator[str]:
+    """Iterate over the parent directories of an absolute path
+
+    >>> list(_parents("/etc/base/file"))
+    ['/etc/base', '/etc', '/']
+    """
+    parent = dirname(path)
+    while parent != path:
+        yield parent
+        path, parent = parent, dirname(parent)
+
+
+def _default_cache_directory() -> str:
+    """The user cache directory, as in the XDG specification"""
+    return join(os.environ.get("XDG_CACHE_HOME") or join(expanduser("~"), ".cache"), "modularconfig")
+
+
+def _cache_file(config_file: str) -> Path:
+    """The file caching a config file, named after its absolute path"""
+    name = sha1(config_file.encode("utf-8", "surrogateescape")).hexdigest()
+    return Path(_cache_directory, name + _cache_suffix)
+
+
+def _read_cache(cache_file: Path, key: tuple):
+    """Return the configs saved in the cache file, or raise LookupError if the cache is missing or stale"""
+    try:
+        with open(cache_file, "br") as fil, mmap(fil.fileno(), 0, access=ACCESS_READ) as cache:
+            if pickle.load(cache) != key:
+                raise LookupError(f"{cache_file} is stale")
+            return pickle.load(cache)
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError) as e:  # missing, empty or corrupted
+        raise LookupError(f"Can't read {cache_file}") from e
+
+
+def _write_cache(cache_file: Path, key: tuple, data: object) -> None:
+    """Atomically save the configs in the cache file"""
+    os.makedirs(cache_file.parent, exist_ok=True)
+    with NamedTemporaryFile(dir=cache_file.parent, prefix=".", suffix=_cache_suffix, delete=False) as fil:
+        try:
+            pickle.dump(key, fil, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(data, fil, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            fil.close()
+            remove(fil.name)
+            raise
+    replace(fil.name, cache_file)
+
+
+def _slurp(config_file: str) -> bytes:
+    """Read a whole file, without the buffering layers of open()"""
+    fd = os.open(config_file, os.O_RDONLY | getattr(os, "O_BINARY", 0))  # O_BINARY exists only on windows
+    try:
+        content = os.read(fd, os.fstat(fd).st_size)  # usually the whole file
+        while True:  # the file could have grown
+            chunk = os.read(fd, DEFAULT_BUFFER_SIZE)
+            if not chunk:
+                return content
+            content += chunk
+    finally:
+        os.close(fd)
+
+
+def _read_file(config_file: str, reload: bool):
+    """Load the content of a file, using the compiled cache if enabled"""
+    if not _disk_cache:
+        return load_bytes(_slurp(config_file))
+    file_stat = stat(config_file)
+    # the cache is valid only for this version of the file, loaded by the same loaders.
+    # the change time can't be set by the user, and catches rewrites that kept the modification time
+    key = (file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_ctime_ns, file_stat.st_size, loaders_signature())
+    cache_file = _cache_file(config_file)
+    if not reload:
+        try:
+            return _read_cache(cache_file, key)
+        except LookupError as e:
+            logger.debug(f"Cache miss for {config_file}: {e}")
+    data = load_bytes(_slurp(config_file))
+    if _cache_directory in _unwritable_cache_directories:
+        return data
+    try:
+        _write_cache(cache_file, key, data)
+    except OSError as e:  # e.g. a read-only directory, every file would fail the same
+        if _cache_directory not in _unwritable_cache_directories:
+            _unwritable_cache_directories.add(_cache_directory)
+            logger.warning(f"Can't write the caches in {_cache_directory}, they won't be saved: {e}")
+    except Exception as e:  # the cache is only an optimization
+        logger.warning(f"Can't cache {config_file}: {e}")
+    return data
+
 
 def _load_path(config_file: Path, reload: bool):
     """Load (or reload) the file/directory in the memory
@@ -131,41 +260,79 @@ def _load_path(config_file: Path, reload: bool):
     >>> get(tmp_file)["answer"]
     54
     """
-    global _loaded_paths, _common_configs_path, _configs
-
-    def recursive_load_path(config_file: Path):
-        """Recursive reload all files"""
-        if (not reload) and (config_file in _loaded_paths):
-            return  # this path is already loaded
-        config_attributes = _split_config_attributes(config_file)
-        if config_file.is_file():
-            with open(config_file, "br") as fil:
-                data = load_file(fil)
-            _set_attr(_configs, config_attributes, data)
-        else:
-            assert config_file.is_dir(), "There are existing paths that are neither files or directories?"
-            # _set_attr(_configs, config_attributes, {})  # create empty dir
-            # no empty dir is created, they will be done if a file is generated inside their sub-tree
-            for child in config_file.iterdir():
-                recursive_load_path(child)  # recursive load
+    global _common_configs_path, _configs
+
+    def recursive_find_files(config_dir: str, config_attributes: Tuple[str, ...]) \
+            -> Iterator[Tuple[str, Tuple[str, ...]]]:
+        """Recursive find all files to (re)load inside a directory, with their attributes"""
+        # scandir entries remember the file type read with the listing, so no stat is done per file
+        with os.scandir(config_dir) as entries:
+            for entry in entries:
+                if (not reload) and (entry.path in _loaded_paths):
+                    continue  # this path is already loaded
+                if entry.is_file():
+                    yield entry.path, config_attributes + (entry.name,)
+                else:
+                    assert entry.is_dir(), "There are existing paths that are neither files or directories?"
+                    # no empty dir is created, they will be done if a file is generated inside their sub-tree
+                    yield from recursive_find_files(entry.path, config_attributes + (entry.name,))
+
+    def is_loaded() -> bool:
+        """Check if the path, or one of its parents, was already loaded"""
+        return config_path in _loaded_paths or any(parent in _loaded_paths for parent in config_parents)
 
     assert config_file.exists(), "This function should be called only on existing paths"
-    if _configs is None:  # first loading
-        if config_file.is_dir():
-            _common_configs_path = config_file
-        else:
-            _common_configs_path = config_file.parent  # the path is always a directory, so the file can be any file
-        _configs = {}
-    elif _common_configs_path not in config_file.parents:
-        _rebase(_common_path(config_file, _common_configs_path))  # moving so it can include the new configs
-    if (not reload) and _loaded_paths.intersection(config_file.parents):
-        return  # is already inside a loaded path (one of his parents was loaded)
-    recursive_load_path(config_file)
-    _loaded_paths = set(
-        path for path in _loaded_paths
-        if path not in config_file.parents  # select only the one that wasn't loaded
-    )
-    _loaded_paths.add(config_file)  # signing this path as loaded
+    config_path = str(config_file)
+    config_parents = list(_parents(config_path))
+    if (not reload) and is_loaded():
+        return
+    if config_file.is_file():
+        found = [(config_path, ())]
+    else:
+        found = list(recursive_find_files(config_path, ()))
+    # parsing without holding the lock: a config (e.g. a python one) can get other configs while it's parsed
+    contents = [_read_file(fil, reload) for fil, _ in found]
+    with _load_lock:  # merging in the tree
+        if (not reload) and is_loaded():
+            return  # another thread loaded it in the meantime
+        if _configs is None:  # first loading
+            if config_file.is_dir():
+                _common_configs_path = config_file
+            else:
+                _common_configs_path = config_file.parent  # the path is always a directory, so the file can be any file
+            _configs = {}
+        elif str(_common_configs_path) not in config_parents:
+            _rebase(_common_path(config_file, _common_configs_path))  # moving so it can include the new configs
+        config_attributes = _split_config_attributes(config_file).parts
+        for (_, file_attributes), data in zip(found, contents):
+            _set_attr(_configs, config_attributes + file_attributes, data)
+        if reload:
+            _forget(config_path)  # the configs could have changed
+        _loaded_paths.difference_update(config_parents)  # select only the one that wasn't loaded
+        _loaded_paths.add(config_path)  # signing this path as loaded
+
+
+def _forget(path: str) -> None:
+    """Forget the configs returned by get() from inside a file or directory
+
+    >>> _remember("/memo/example", "/memo/example/foo", 42)
+    >>> _got_configs["/memo/example/foo"]
+    42
+    >>> _forget("/memo")
+    >>> "/memo/example/foo" in _got_configs
+    False
+    """
+    nested_prefix = join(path, "")  # with the trailing separator
+    for config_file in [fil for fil in _got_by_file if fil == path or fil.startswith(nested_prefix)]:
+        for config_path in _got_by_file.pop(config_file):
+            del _got_configs[config_path]
+
+
+def _remember(config_file: str, config_path: str, config: object) -> None:
+    """Remember a config returned by get(), until the file (or directory) containing it is reloaded"""
+    if config_path not in _got_configs:
+        _got_by_file.setdefault(config_file, []).append(config_path)
+    _got_configs[config_path] = config
 
 
 # --- Recursive Get and Set ---
@@ -184,31 +351,22 @@ def _get_attr(obj: object, attrs: PurePath):
     KeyError: PurePosixPath('baz/foo')
 
     """
-
-    def _recursive_get(found_obj: object, remaining_attrs: Iterator[str]):
+    parts = attrs.parts
+    found_obj = obj
+    for depth, attr in enumerate(parts):
         try:
-            attr = next(remaining_attrs)  # the attribute we need to open at this level at this level
-        except StopIteration:
-            return found_obj  # we got to the end of the path
-        child_obj = found_obj[attr]
-        try:
-            return _recursive_get(child_obj, remaining_attrs)
+            found_obj = found_obj[attr]
         except LookupError as e:  # an attribute wasn't found
-            e.args = (attr,) + e.args  # adding the full path to the exception
+            e.args = (PurePath(*parts[:depth + 1]),)  # the path to the missing attribute
             raise
-
-    try:
-        return _recursive_get(obj, iter(attrs.parts))
-    except LookupError as e:
-        e.args = (PurePath(*e.args),)
-        raise
+    return found_obj
 
 
-def _set_attr(obj: object, attrs: PurePath, value: object):
+def _set_attr(obj: object, attrs: Tuple[str, ...], value: object):
     """Recursively set attributes to an object.
 
     >>> dct = {"baz":{"bar":42}}
-    >>> _set_attr(dct, PurePath("baz/bar"), 12)  # equivalent to dct["baz"]["bar"] = 12
+    >>> _set_attr(dct, ("baz", "bar"), 12)  # equivalent to dct["baz"]["bar"] = 12
     >>> dct["baz"]["bar"]
     12
 
@@ -219,26 +377,17 @@ def _set_attr(obj: object, attrs: PurePath, value: object):
     KeyError: PurePosixPath('baz/foo')
 
     """
-
-    def _recursive_set(found_obj: object, remaining_attrs: List[str]):
-        attr = remaining_attrs.pop(0)  # the attribute we need to open at this level at this level
-        if len(remaining_attrs) == 0:  # we arrived at the end
-            found_obj[attr] = value
-            return
-        if attr not in found_obj:
-            found_obj[attr] = {}  # creating parent dirs as needed
-        child_obj = found_obj[attr]
+    *parents, last = attrs
+    found_obj = obj
+    for depth, attr in enumerate(parents):
         try:
-            _recursive_set(child_obj, remaining_attrs)
+            if attr not in found_obj:
+                found_obj[attr] = {}  # creating parent dirs as needed
+            found_obj = found_obj[attr]
         except LookupError as e:  # an attribute wasn't found
-            e.args = (attr,) + e.args  # adding the full path to the exception
+            e.args = (PurePath(*parents[:depth + 1]),)  # the path to the missing attribute
             raise
-
-    try:
-        _recursive_set(obj, list(attrs.parts))
-    except LookupError as e:
-        e.args = (PurePath(*e.args),)
-        raise
+    found_obj[last] = value
 
 
 # --- End User Entry Points ---
@@ -249,18 +398,38 @@ def using_config_directory(relative_config_directory: Union[str, PurePath]):
     global _config_directory
     old_dir = _config_directory
     set_config_directory(relative_config_directory)
-    yield
-    _config_directory = old_dir  # returning back
+    try:
+        yield
+    finally:
+        _config_directory = old_dir  # returning back, even if the block failed
+        _find_real_file.cache_clear()
 
 
 def set_config_directory(relative_config_directory: Union[str, PurePath]):
     """Change the config directory. Can be relative to the old"""
     global _config_directory
-    _config_directory = _relative_to_config_directory(relative_config_directory)
+    _config_directory = str(_relative_to_config_directory(relative_config_directory))
+    _find_real_file.cache_clear()
 
 def get_config_directory():
     """Return the config directory"""
-    return _config_directory
+    return Path(_config_directory)
+
+
+def set_disk_cache(enabled: bool, cache_directory: Union[str, PurePath, None] = None):
+    """Enable or disable the compiled configs cache.
+
+    When enabled every loaded file is saved, already parsed, in the cache directory (by default
+    "$XDG_CACHE_HOME/modularconfig" or "~/.cache/modularconfig", relative paths start from the config directory),
+    and later loads read it back instead of parsing the file again, until the file or the loaders are modified.
+    The caches are pickled, so enable this only if the cache directory is trusted"""
+    global _disk_cache, _cache_directory
+    _disk_cache = enabled
+    _unwritable_cache_directories.clear()  # try them again, the permissions could have been fixed
+    if cache_directory is None:
+        _cache_directory = _default_cache_directory()
+    else:
+        _cache_directory = _resolve_config(cache_directory)
 
 
 def ensure(config_file: Union[Path, str, bytes], reload: bool = False):
@@ -282,6 +451,8 @@ def ensure(config_file: Union[Path, str, bytes], reload: bool = False):
     >>> get(tmp_file)["answer"]
     54
     """
+    if reload:
+        _find_real_file.cache_clear()  # the file system could have changed
     _load_path(_relative_to_config_directory(config_file), reload)
 
 
@@ -296,9 +467,19 @@ def get(config: Union[str, PurePath]):
     'foo'
     >>> remove(filename)
     """
-    config = _relative_to_config_directory(config)
-    _load_path(_split_real_file(config), reload=False)  # ensure the file is loaded
+    config_path = _resolve_config(config)
     try:
-        return _get_attr(_configs, _split_config_attributes(config))
-    except LookupError as e:
-        raise ConfigNotFoundError(f"Can't find the config {e.args[0]}") from e
+        return _got_configs[config_path]  # already asked
+    except KeyError:
+        pass
+    config = Path(config_path)
+    config_file = _split_real_file(config)
+    _load_path(config_file, reload=False)  # ensure the file is loaded
+    with _load_lock:  # the tree could be rebased, or the file reloaded, while it's walked
+        config_attributes = _split_config_attributes(config)
+        try:
+            found = _get_attr(_configs, config_attributes)
+        except LookupError as e:
+            raise ConfigNotFoundError(f"Can't find the config {e.args[0]}") from e
+        _remember(str(config_file), config_path, found)
+    return found
@@ -1,8 +1,15 @@
+import re
+from collections import OrderedDict
+from copy import deepcopy
+from functools import wraps
+from hashlib import sha1
 from io import BytesIO
 from locale import getpreferredencoding
-from pathlib import Path
+from os import urandom
 from importlib import import_module
-from typing import List, Callable, Any, Dict
+from threading import Lock
+from types import ModuleType
+from typing import List, Callable, Any, Dict, Tuple, Sequence, Union, Set
 
 
 from modularconfig.errors import LoaderMissingError, LoadingError, DisabledLoaderError
@@ -11,8 +18,237 @@ from modularconfig.loaders.datatype import load as load_datatype
 from logging import getLogger
 logger = getLogger(__name__)
 
-dangerous_loaders: Dict[str, bool] = {}
-loaders: Dict[str, Callable[[str, Dict[str, str]], Any]] = {}
+
+# the parsed contents of the last loaded files, by raw content. None if disabled
+_content_cache: "Union[OrderedDict[bytes, Any], None]" = None
+_content_cache_lock = Lock()  # files are loaded from multiple threads
+_CONTENT_CACHE_SIZE = 128
+# the results of these types can be returned from the cache without copying them
+_IMMUTABLE_TYPES = (str, bytes, int, float, complex, bool, type(None))
+
+
+class _DangerousFlags(Dict[str, bool]):
+    """The flags enabling the dangerous loaders.
+
+    Setting a flag binds the chosen load function in loaders, so loading never looks for the flags.
+    The bound functions check the flag again only to stay correct if they were taken from loaders before it changed
+    """
+
+    def __init__(self):
+        super().__init__()
+        # aliases, safe and dangerous load functions of each dangerous loader
+        self._load_funcs: Dict[str, Tuple[List[str], Callable, Callable]] = {}
+
+    def _bind(self, name: str, aliases: List[str], safe_func: Callable, dangerous_func: Callable):
+        """Register the load functions of a dangerous loader, that will be bound when the flag is set"""
+        @wraps(safe_func)
+        def checked_safe_func(text, options: Dict[str, str]):
+            if self.get(name, False):  # enabled after this function was bound
+                return dangerous_func(text, options)
+            return safe_func(text, options)
+
+        @wraps(dangerous_func)
+        def checked_dangerous_func(text, options: Dict[str, str]):
+            if not self.get(name, False):  # disabled after this function was bound
+                return safe_func(text, options)
+            return dangerous_func(text, options)
+        _impure_load_funcs.add(checked_dangerous_func)  # it can run arbitrary code
+        self._load_funcs[name] = (aliases, checked_safe_func, checked_dangerous_func)
+
+    def _unbind(self, names: List[str]):
+        """Forget the dangerous loaders with the given names, that were replaced by safe ones"""
+        for name in names:
+            self._load_funcs.pop(name, None)
+            super().pop(name, None)
+
+    def __setitem__(self, name: str, flag: bool):
+        super().__setitem__(name, flag)
+        if name in self._load_funcs:
+            aliases, safe_func, dangerous_func = self._load_funcs[name]
+            for alias in aliases:
+                loaders[alias] = dangerous_func if flag else safe_func
+
+    def __delitem__(self, name: str):
+        if name not in self:
+            raise KeyError(name)
+        self[name] = False  # back to the safe function
+        super().__delitem__(name)
+
+    # the other mutating methods of dict don't call the ones above
+
+    def pop(self, name: str, *default):
+        if name not in self:
+            return super().pop(name, *default)  # raising KeyError without a default
+        flag = self[name]
+        del self[name]
+        return flag
+
+    def popitem(self) -> Tuple[str, bool]:
+        name = next(reversed(list(self)))  # the last inserted, as dict does
+        return name, self.pop(name)
+
+    def clear(self):
+        for name in list(self):
+            del self[name]
+
+    def setdefault(self, name: str, default: bool = None):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def update(self, *args, **kwargs):
+        for name, flag in dict(*args, **kwargs).items():
+            self[name] = flag
+
+
+# set when loaders or auto_loaders are modified, the tables built from them are refreshed before the next use
+_loaders_changed: bool = True
+
+
+def _marking_loaders_changed(method: Callable) -> Callable:
+    """Wrap a mutating method of a container, to mark the loaders as changed"""
+    def marking_method(self, *args, **kwargs):
+        global _loaders_changed
+        result = method(self, *args, **kwargs)
+        _loaders_changed = True
+        return result
+    marking_method.__name__ = method.__name__
+    marking_method.__doc__ = method.__doc__
+    return marking_method
+
+
+class _LoadersDict(dict):
+    """The registered load functions by name, modifying it refreshes the loaders before the next load"""
+
+
+class _AutoLoadersList(list):
+    """The names of the auto loaders, modifying it refreshes the loaders before the next load"""
+
+
+for _method in ("__setitem__", "__delitem__", "__ior__", "clear", "pop", "popitem", "setdefault", "update"):
+    if hasattr(dict, _method):  # __ior__ is missing before python 3.9
+        setattr(_LoadersDict, _method, _marking_loaders_changed(getattr(dict, _method)))
+for _method in (
+        "__setitem__", "__delitem__", "__iadd__", "__imul__",
+        "append", "clear", "extend", "insert", "pop", "remove", "reverse", "sort"
+):
+    setattr(_AutoLoadersList, _method, _marking_loaders_changed(getattr(list, _method)))
+del _method
+
+
+dangerous_loaders: Dict[str, bool] = _DangerousFlags()
+loaders: Dict[str, Callable[[str, Dict[str, str]], Any]] = _LoadersDict()
+_binary_loaders: Set[str] = set()  # the loaders that accept the undecoded bytes
+# the load functions whose result could not depend only on the content (e.g. python configs), never cached
+_impure_load_funcs: Set[Callable[[str, Dict[str, str]], Any]] = set()
+
+# if no type is specified this loaders will be tried in this order
+auto_loaders: List[str] = _AutoLoadersList([
+    "number",
+    "bool",
+    "none",
+    "ini",
+    "yaml",  # if not installed will use the dummy loader
+    "json",
+    "python",  # disabled by default
+    "text"
+])
+# first characters of the texts that some auto loaders can accept, the others are tried on any text
+_first_chars: Dict[str, str] = {
+    "number": "0123456789+-.(iInNjJ",  # also inf, nan, and complex numbers
+    "bool": "tTyYoOfFnN10",
+    "none": "nN",
+    "ini": "[#;",  # a section or a comment
+}
+
+# digest of the registered loaders, recomputed after they change. None if not computed yet
+_signature: Union[str, None] = None
+# the "version" attribute of the loader registered under each name, if any
+_loader_versions: Dict[str, Any] = {}
+# ids are reused by other runs of the program, this tells them apart
+_RUN_TOKEN = urandom(8).hex()
+
+# the auto loaders, bound to their load functions
+_auto_loaders: Tuple[Tuple[str, Callable[[str, Dict[str, str]], Any]], ...] = ()
+# the auto loaders to try on texts starting with each ascii character
+_auto_loaders_by_char: Dict[str, Tuple[Tuple[str, Callable[[str, Dict[str, str]], Any]], ...]] = {}
+
+
+def refresh_loaders():
+    """Bind the names in auto_loaders to the registered load functions.
+
+    It's done automatically before loading after loaders or auto_loaders are modified.
+    Names without a registered loader are skipped
+    """
+    global _auto_loaders, _auto_loaders_by_char, _signature, _loaders_changed
+    _loaders_changed = False  # before rebuilding, a concurrent change will be seen by the next use
+    _signature = None
+    if _content_cache is not None:
+        with _content_cache_lock:
+            _content_cache.clear()  # the files could load differently now
+    _auto_loaders = tuple(
+        (name, loaders[name]) for name in auto_loaders if name in loaders
+    )
+    _auto_loaders_by_char = {
+        chr(code): _select_auto_loaders(chr(code)) for code in range(33, 127)  # printable ascii, no space
+    }
+
+
+def _load_func_identity(func: Callable[[str, Dict[str, str]], Any]) -> Tuple[Any, ...]:
+    """Identify a load function, by its qualified name if it is the same in every run of the program
+
+    >>> _load_func_identity(load_datatype)
+    ('modularconfig.loaders.datatype', 'load')
+
+    Closures and methods of objects can carry their own state, they are identified by the object itself
+    >>> _load_func_identity(lambda text, options: text)[0] == "<object>"
+    True
+    """
+    func = getattr(func, "__wrapped__", func)  # the dangerous loaders are bound checking their flag
+    qualname = getattr(func, "__qualname__", None)
+    owner = getattr(func, "__self__", None)
+    if qualname is None or "<locals>" in qualname or "<lambda>" in qualname \
+            or not (owner is None or isinstance(owner, ModuleType)):
+        # caches made with these functions can be used only in this run
+        return "<object>", _RUN_TOKEN, id(owner if owner is not None else func)
+    return getattr(func, "__module__", None), qualname
+
+
+def loaders_signature() -> str:
+    """A digest of the loaders state: the load function bound to each name, the auto loaders and the binary ones.
+
+    It changes when a file could load differently, e.g. after a dangerous loader is enabled.
+    Functions are identified by their qualified name and the "version" attribute of their loader,
+    so the digest is the same in every run of the program, unless the functions are closures or bound methods
+    """
+    global _signature
+    if _loaders_changed:
+        refresh_loaders()
+    if _signature is None:
+        state = (
+            sorted(
+                (alias, _load_func_identity(func), repr(_loader_versions.get(alias)))
+                for alias, func in loaders.items()
+            ),
+            list(auto_loaders),
+            sorted(_binary_loaders),
+        )
+        _signature = sha1(repr(state).encode()).hexdigest()
+    return _signature
+
+
+def _select_auto_loaders(first: str) -> Tuple[Tuple[str, Callable[[str, Dict[str, str]], Any]], ...]:
+    """Select the auto loaders that could load a text starting with the given character"""
+    selected = [
+        (name, load_func) for name, load_func in _auto_loaders
+        if name not in _first_chars or first in _first_chars[name]
+    ]
+    names = [name for name, _ in selected]
+    if first in "{[" and "json" in names and "yaml" in names \
+            and names.index("yaml") < names.index("json"):
+        # json is (almost) a subset of yaml, but much faster to parse
+        selected.insert(names.index("yaml"), selected.pop(names.index("json")))
+    return tuple(selected)
 
 
 def register_loader(loader, use_dangerous: bool = False):
@@ -23,6 +259,9 @@ def register_loader(loader, use_dangerous: bool = False):
     -At least one of "load" or "dangerous_load" of type Callable[[str, Dict[str, str]], object]
 
     Optionally loader can define a "aliases" list, that are equivalent names under wich the loader will be called
+    a "binary" flag: if True the file content is passed as bytes, unless an encoding is specified,
+    a "pure" flag: if False the results are never kept in the content cache
+    and a "version": changing it invalidates the compiled caches made with the previous one
 
     If "dangerous_load" is disponible a flag will be setted in "dangerous_loaders" to the value of "use_dangerous".
     If the flag is false only the safe method will be used, otherwise the dangerous will become the default.
@@ -39,66 +278,61 @@ def register_loader(loader, use_dangerous: bool = False):
     if not (hasattr(loader, "load") or hasattr(loader, "dangerous_load")):
         raise TypeError(f"{loader} do not define any load function")
 
+    logger.info(f"Adding {loader.name} to the loaders")
+    aliases = [loader.name]
+    if hasattr(loader, "aliases"):
+        aliases.extend(loader.aliases)
+    for alias in aliases:
+        _loader_versions[alias] = getattr(loader, "version", None)
+    if getattr(loader, "binary", False):
+        _binary_loaders.update(aliases)
+    else:
+        _binary_loaders.difference_update(aliases)
+    if hasattr(loader, "load") and not getattr(loader, "pure", True):
+        _impure_load_funcs.add(loader.load)
+
     if hasattr(loader, "dangerous_load"):
-        dangerous_loaders[loader.name] = use_dangerous  # creating the flag
         if hasattr(loader, "load"):
-            # creating a function that choose between the two loading
-            def load_func(text: str, options: Dict[str, str]):
-                if dangerous_loaders[loader.name]:
-                    return loader.dangerous_load(text, options)
-                else:
-                    return loader.load(text, options)
-            load_func.__doc__ = f"Load function for type {loader.name}\n" \
-                                "\n" \
-                                f"If dangerous_loaders['{loader.name}'] is True:\n" \
-                                "\n" \
-                                f"{loader.dangerous_load.__doc__}\n" \
-                                "\n" \
-                                "otherwise:\n" \
-                                "\n" \
-                                f"{loader.load.__doc__}\n"
+            safe_func = loader.load
         else:
             # safeguarding the usage of the dangerous load
-            def load_func(text: str, options: Dict[str, str]):
-                if dangerous_loaders[loader.name]:
-                    return loader.dangerous_load(text, options)
-                else:
-                    raise DisabledLoaderError(f"'{loader.name}' loader is disabled. "
-                                              f"Set dangerous_loaders['{loader.name}'] to True to enable")
-            load_func.__doc__ = f"{loader.dangerous_load.__doc__}\n" \
+            def safe_func(text: str, options: Dict[str, str]):
+                raise DisabledLoaderError(f"'{loader.name}' loader is disabled. "
+                                          f"Set dangerous_loaders['{loader.name}'] to True to enable")
+            safe_func.__doc__ = f"{loader.dangerous_load.__doc__}\n" \
                                 f"\n" \
                                 f"Usable only if dangerous_loaders['{loader.name}'] is True"
+        dangerous_loaders._bind(loader.name, aliases, safe_func, loader.dangerous_load)
+        dangerous_loaders[loader.name] = use_dangerous  # creating the flag, and binding the load function
     else:
-        load_func = loader.load  # only safe loading is there
+        dangerous_loaders._unbind(aliases)  # a dangerous loader with the same name would rebind its functions
+        for alias in aliases:
+            loaders[alias] = loader.load  # only safe loading is there
 
-    logger.info(f"Adding {loader.name} to the loaders")
-    aliases = [loader.name]
-    if hasattr(loader, "aliases"):
-        aliases.extend(loader.aliases)
-    for alias in aliases:
-        loaders[alias] = load_func
 
+# the loaders shipped in this package, listed to avoid scanning the directory (that fails in frozen builds)
+_loader_modules = (
+    "base64",
+    "bool",
+    "complex",
+    "datatype",
+    "float",
+    "ini",
+    "int",
+    "json_",
+    "none",
+    "number",
+    "python",
+    "text",
+    "yaml_",
+)
 
-for file_name in Path(__file__).parent.glob("*.py"):
-    if file_name.name == "__init__.py":
-        continue  # skip this file
-    logger.info(f"Loading {file_name.stem}")
+for module_name in _loader_modules:
+    logger.info(f"Loading {module_name}")
     register_loader(
-        import_module(f"modularconfig.loaders.{file_name.stem}")
+        import_module(f"modularconfig.loaders.{module_name}")
     )
-
-
-# if no type is specified this loaders will be tried in this order
-auto_loaders: List[str] = [
-    "number",
-    "bool",
-    "none",
-    "ini",
-    "yaml",  # if not installed will use the dummy loader
-    "json",
-    "python",  # disabled by default
-    "text"
-]
+del module_name
 
 # checking that all the default loader are ready
 for name in auto_loaders:
@@ -108,6 +342,32 @@ for name in auto_loaders:
         )
 del name
 
+_first_char = re.compile(r"\s*(\S)")
+
+_TYPE_MARKER = b"#type:"  # start of the header line specifying the loader
+_DEFAULT_ENCODING = getpreferredencoding(False)  # asking the locale at every load is slow
+
+
+def _sniff_auto_loaders(text: str) -> Sequence[Tuple[str, Callable[[str, Dict[str, str]], Any]]]:
+    """Select the auto loaders that could load the text, looking at its first character
+
+    >>> [name for name, _ in _sniff_auto_loaders("[section]")]
+    ['ini', 'json', 'yaml', 'python', 'text']
+    >>> [name for name, _ in _sniff_auto_loaders(" 42")]
+    ['number', 'yaml', 'json', 'python', 'text']
+
+    Texts that could be json are tried as json before yaml
+    >>> [name for name, _ in _sniff_auto_loaders('{"answer": 42}')]
+    ['json', 'yaml', 'python', 'text']
+    """
+    if _loaders_changed:
+        refresh_loaders()
+    match = _first_char.match(text)
+    if match is None:
+        return _auto_loaders  # empty text
+    # unicode could be anything (e.g. digits), so all the loaders are tried
+    return _auto_loaders_by_char.get(match.group(1), _auto_loaders)
+
 
 def load_file(file: BytesIO):
     """Load a python object from the file content
@@ -137,40 +397,95 @@ def load_file(file: BytesIO):
 
     Logs the failed tries with the logging module, with level logging.DEBUG
     """
-    head = file.read(6)
-    if head == "#type:".encode("utf-8"):  # a loader is specified?
+    return load_bytes(file.read())
+
+
+def set_content_cache(enabled: bool):
+    """Enable or disable the cache of the parsed contents.
+
+    When enabled, loading the same content as one of the last files returns a copy of the already parsed object.
+    The contents loaded by dangerous loaders, or by loaders with a false "pure" attribute, are never cached.
+    The cache is cleared when the loaders change"""
+    global _content_cache
+    with _content_cache_lock:
+        _content_cache = OrderedDict() if enabled else None
+
+
+def load_bytes(content: bytes):
+    """Load a python object from the content of a file, as load_file does
+
+    >>> load_bytes(b"#type: int\\n42")
+    42
+    """
+    if _loaders_changed:
+        refresh_loaders()  # clearing the content cache too
+    if _content_cache is None:
+        return _parse_bytes(content)[0]
+    with _content_cache_lock:
+        if _content_cache is not None and content in _content_cache:
+            _content_cache.move_to_end(content)
+            cached = _content_cache[content]
+            if type(cached) in _IMMUTABLE_TYPES:
+                return cached
+            return deepcopy(cached)  # the caller could modify it
+    data, load_func = _parse_bytes(content)
+    if load_func in _impure_load_funcs:
+        return data  # the same content could load differently next time
+    if type(data) in _IMMUTABLE_TYPES:
+        cached = data
+    else:
+        try:
+            cached = deepcopy(data)
+        except Exception:  # some objects can't be copied
+            return data
+    with _content_cache_lock:
+        if _content_cache is not None:
+            _content_cache[content] = cached
+            if len(_content_cache) > _CONTENT_CACHE_SIZE:
+                _content_cache.popitem(last=False)  # dropping the least recently used
+    return data
+
+
+def _parse_bytes(content: bytes) -> Tuple[Any, Callable[[str, Dict[str, str]], Any]]:
+    """Load a python object from the content of a file, return it with the load function that was used"""
+    if content.startswith(_TYPE_MARKER):  # a loader is specified?
+        header_end = content.find(b"\n")
+        if header_end == -1:  # there is only the header
+            header_end = len(content)
         data_type, options = load_datatype(
-            file.readline().decode("utf-8")[:-1],  # options encoding is utf-8, indexing to strip the newline
+            content[len(_TYPE_MARKER):header_end].decode("utf-8"),  # options encoding is utf-8
             {}
         )
+        load_func = loaders.get(data_type)
+        if load_func is None:
+            raise LoaderMissingError(data_type)
         # detect encoding
         if "encoding" in options:
             encoding = options.pop("encoding").strip()
+        elif data_type in _binary_loaders:
+            return load_func(content[header_end + 1:], options), load_func  # no need to decode
         else:
-            encoding = getpreferredencoding()
+            encoding = _DEFAULT_ENCODING
         # if an encoding is specified, use that
         try:
-            text = file.read().decode(encoding)
+            text = str(memoryview(content)[header_end + 1:], encoding)
         except LookupError as e:
             raise LoadingError(f"Unknown encoding {encoding}") from e
         except UnicodeDecodeError as e:
             raise LoadingError(f"Cant decode file using {encoding}") from e
         # load data
-        if data_type in loaders:
-            data = loaders[data_type](text, options)
-        else:
-            raise LoaderMissingError(data_type)
+        data = load_func(text, options)
 
     else:  # no loader specified, try to autodetect
-        encoding = getpreferredencoding()
+        encoding = _DEFAULT_ENCODING
         try:
-            text = (head + file.read()).decode(encoding)
+            text = content.decode(encoding)
         except UnicodeDecodeError as e:
             raise LoadingError(f"Cant decode file using {encoding}") from e
         exceptions = []
-        for name in auto_loaders:
+        for name, load_func in _sniff_auto_loaders(text):
             try:
-                data = loaders[name](
+                data = load_func(
                     text, {}
                 )
             except LoadingError as e:  # loader didn't work
@@ -181,4 +496,4 @@ def load_file(file: BytesIO):
         else:  # no loader worked
             # usually this is never throw thanks to text loader
             raise LoadingError("None of the loaders worked") from Exception(*exceptions)
-    return data
+    return data, load_func
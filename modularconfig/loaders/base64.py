@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, Union
 from base64 import b64decode
 from binascii import Error as b64Error
 
@@ -7,11 +7,17 @@ from modularconfig.errors import LoadingError, OptionParseError
 from .bool import load as load_boolean
 
 name = "base64"
-aliases = ["b64"]
+aliases = ("b64",)
+binary = True  # the base64 alphabet is ascii, there is no need to decode the file
 
 
-def load(text: str, options: Dict[str, str]) -> bytes:
+def load(text: Union[str, bytes], options: Dict[str, str]) -> bytes:
     """Load the text as a base64 object"""
+    if not options:  # the usual case, no need to parse anything
+        try:
+            return b64decode(text)
+        except b64Error as e:
+            raise LoadingError("Can't decode base64") from e
     parsed_options = {}
     if "altchars" in options:
         parsed_options["altchars"] = options["altchars"]
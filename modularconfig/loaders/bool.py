@@ -2,14 +2,28 @@ from typing import Dict
 from modularconfig.errors import LoadingError
 
 name = "bool"
-aliases = ["boolean"]
+aliases = ("boolean",)
+
+# the same words accepted by configparser
+_true_words = frozenset({"true", "yes", "on", "1"})
+_false_words = frozenset({"false", "no", "off", "0"})
 
 
 def load(text: str, options: Dict[str, str]) -> bool:
-    """If the lowered text is 'true' or 'false' the appropriate boolean is returned"""
+    """If the lowered text is 'true' or 'false' the appropriate boolean is returned
+
+    'yes', 'on', '1' and 'no', 'off', '0' are accepted as well
+
+    >>> load(" Yes", {}), load("0", {})
+    (True, False)
+    """
+    if text in _true_words:  # already clean, no need to copy it
+        return True
+    if text in _false_words:
+        return False
     text = text.strip().lower()
-    if text in {"true", "yes", "on"}:
+    if text in _true_words:
         return True
-    if text in {"false", "no", "off"}:
+    if text in _false_words:
         return False
-    raise LoadingError("Can't determine boolean value")
\ No newline at end of file
+    raise LoadingError("Can't determine boolean value")
@@ -1,52 +1,44 @@
-from typing import Iterator, Union, Tuple, Dict
+import codecs
+import re
+from functools import lru_cache
+from sys import intern
+from typing import Tuple, Dict
 
 from modularconfig.errors import OptionParseError
 
 name = "datatype"
 
-def expand_token(tokens: Iterator[Union[str, object]], token_str: str, token_obj: object) \
-    -> Iterator[Union[str, object]]:
-    """
-    Expand a token from strings
+# an escaped separator, a separator, a run of text or another escape sequence
+_option_token = re.compile(
+    r"\\([=;])|(=)|(;)|([^\\=;]+)"
+    r"|(\\(?:x[0-9a-fA-F]{2}|u[0-9a-fA-F]{4}|U[0-9a-fA-F]{8}|N\{[^}]*\}|[0-7]{1,3}|.)?)"
+)
+_ESCAPED, _EQUAL, _SEPARE, _TEXT, _ESCAPE = 1, 2, 3, 4, 5  # groups of _option_token
 
-    >>> list(expand_token(iter(["hello for a friend of a friend"]), "friend", 3))
-    ['hello for a ', 3, ' of a ', 3, '']
-    """
-    for token in tokens:
-        if isinstance(token, str):  #splitting
-            subtokens = token.split(token_str)
-            yield subtokens[0]
-            for subtoken in subtokens[1:]:
-                yield token_obj
-                yield subtoken
-        else:
-            yield token  # do not touch
+# the most common escape sequences, the others are decoded by the unicode_escape codec
+_escapes = {
+    "\\n": "\n", "\\t": "\t", "\\r": "\r", "\\\\": "\\", "\\'": "'", '\\"': '"', "\\0": "\0"
+}
 
 
-def collapse_token(tokens: Iterator[Union[str, object]], token_str: str, token_obj: object) \
-    -> Iterator[Union[str, object]]:
-    """Inverse the token expansion
+def _unescape(sequence: str) -> str:
+    """Decode a backslash escape sequence, as in python string literals
 
-    >>> list(collapse_token(iter(['hello for a ', 3, ' of a ', 3, '']), "friend", 3))
-    ['hello for a friend of a friend']
-
-    it collapse strings too
-    >>> list(collapse_token(iter(["it ", "collapse ", "strings"]), "friend", 3))
-    ['it collapse strings']
+    >>> _unescape("\\\\t"), _unescape("\\\\x41"), _unescape("\\\\q")
+    ('\\t', 'A', '\\\\q')
     """
-    cum_string = ""
-    for token in tokens:
-        if isinstance(token, str):
-            cum_string += token
-        elif token == token_obj:
-            cum_string += token_str
-        else:
-            if cum_string:  # we found an untouch token, cleaning cumulative string
-                yield cum_string
-                cum_string = ""
-            yield token
-    if cum_string:  # yielding last string
-        yield cum_string
+    try:
+        return _escapes[sequence]
+    except KeyError:
+        pass
+    try:
+        sequence.encode("ascii")
+    except UnicodeEncodeError:  # str.isascii() needs python 3.7
+        return sequence  # not an escape sequence, as unicode_escape would do
+    try:
+        return codecs.decode(sequence, "unicode_escape")
+    except UnicodeDecodeError as e:
+        raise OptionParseError(f"Invalid escape sequence {sequence}") from e
 
 
 def load(datatype: str, options: Dict[str, str]) -> Tuple[str, Dict[str, str]]:
@@ -62,46 +54,32 @@ def load(datatype: str, options: Dict[str, str]) -> Tuple[str, Dict[str, str]]:
     ...     "loader : surprise =can use escape sequences \\\\=, \\\\;, \\\\n, \\\\\\\\t", {}
     ... )[1]["surprise"]
     'can use escape sequences =, ;, \\n, \\\\t'
+    >>> load("text: name = caffè\\\\t", {})
+    ('text', {'name': ' caffè\\t'})
+
+    The same header is parsed only once, every call get a new dict of options
     """
+    datatype, parsed_opt = _parse(datatype)
+    return datatype, dict(parsed_opt)
+
+
+@lru_cache(maxsize=256)
+def _parse(datatype: str) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    """Memoized implementation of load, with the options as immutable pairs"""
     datatype_and_opt = datatype.split(":", maxsplit=1)
     if len(datatype_and_opt) == 1:  # no options
-        return datatype.strip(), {}
+        return intern(datatype.strip()), ()  # interned, so the loader lookup compares by identity
     datatype, options = datatype_and_opt
-    EQUAL_TOKEN, SEPARE_TOKEN = object(), object()
-    ESCAPED_EQUAL, ESCAPED_SEPARE = object(), object()
-    # first we separe our escaped sequences
-    explicit_escapes = expand_token(
-        expand_token(
-            iter([options]), "\\=", ESCAPED_EQUAL
-        ), "\\;", ESCAPED_SEPARE
-    )
-    # then we escape our true separators
-    explicit_escapes = expand_token(
-        expand_token(
-            explicit_escapes, "=", EQUAL_TOKEN
-        ), ";", SEPARE_TOKEN
-    )
-    # finally we recollapse our escaped sequence
-    tokenized_options = list(collapse_token(
-        collapse_token(
-            explicit_escapes, "=", ESCAPED_EQUAL
-        ), ";", ESCAPED_SEPARE
-    ))
-    # now tokenized_options is a list of strings, EQUAL_TOKEN, SEPARE_TOKEN
     opt_name, opt_content = "", ""
     reading_name = True  # false when reading content
     parsed_opt = {}
-    for token in tokenized_options:
-        if isinstance(token, str):
-            if reading_name:
-                opt_name += token
-            else:
-                opt_content += token
-        elif token == EQUAL_TOKEN:
+    for token in _option_token.finditer(options):
+        kind = token.lastindex
+        if kind == _EQUAL:
             if not reading_name:
                 raise OptionParseError(f"Double equal sign in {datatype}")
             reading_name = False  # start reading content
-        elif token == SEPARE_TOKEN:  # came to an end of option
+        elif kind == _SEPARE:  # came to an end of option
             opt_name = opt_name.strip()
             if not opt_name:
                 raise OptionParseError(f"No options name in {datatype}")
@@ -109,12 +87,15 @@ def load(datatype: str, options: Dict[str, str]) -> Tuple[str, Dict[str, str]]:
             # resetting parser
             opt_name, opt_content = "", ""
             reading_name = True
+        elif reading_name:  # escape sequences are decoded only in the content
+            opt_name += token.group(kind)
+        elif kind == _ESCAPE:
+            opt_content += _unescape(token.group(kind))
+        else:
+            opt_content += token.group(kind)
     # parsing last option
     opt_name = opt_name.strip()
     if not opt_name:
         raise OptionParseError(f"No options name in {datatype}")
     parsed_opt[opt_name] = opt_content
-    # escaping standard escape sequences
-    for opt in parsed_opt:
-        parsed_opt[opt] = parsed_opt[opt].encode("utf-8").decode("unicode_escape")
-    return datatype.strip(), parsed_opt
\ No newline at end of file
+    return intern(datatype.strip()), tuple(parsed_opt.items())
\ No newline at end of file
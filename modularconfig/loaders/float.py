@@ -2,7 +2,7 @@ from typing import Dict
 from modularconfig.errors import LoadingError
 
 name = "float"
-aliases = ["real"]
+aliases = ("real",)
 
 
 def load(text: str, options: Dict[str, str]) -> float:
@@ -7,7 +7,7 @@ from .bool import load as load_boolean
 
 
 name = "ini"
-aliases = ["inifile", "winconfig"]
+aliases = ("inifile", "winconfig")
 
 
 def parse_tuple_of_strings(text:str) -> Tuple[str]:
@@ -1,14 +1,24 @@
+import re
 from typing import Dict
 from modularconfig.errors import LoadingError
 
 name = "int"
-aliases = ["integer"]
+aliases = ("integer",)
+
+# exactly the texts int() accepts in base 10, once stripped
+integer = re.compile(r"[+-]?\d+(?:_\d+)*")
 
 
 def load(text: str, options: Dict[str, str]) -> int:
-    """Try to load a number as a int.py"""
+    """Try to load a number as a int.py
+
+    >>> load(" -1_000 ", {})
+    -1000
+    """
     text = text.strip()
+    if not integer.fullmatch(text):  # rejecting without letting int() raise
+        raise LoadingError("Can't convert to an integer")
     try:
         return int(text)
-    except ValueError as e:
-        raise LoadingError("Can't convert to an integer") from e
\ No newline at end of file
+    except ValueError as e:  # too many digits
+        raise LoadingError("Can't convert to an integer") from e
@@ -1,14 +1,39 @@
+import re
 from typing import Dict
 from modularconfig.errors import LoadingError
 
 from json import loads, JSONDecodeError
 
+try:
+    from orjson import loads as fast_loads
+except ImportError:
+    fast_loads = None
+
 name = "json"
 
+# orjson silently turns integers outside the 64 bit range into floats
+_long_integer = re.compile(r"\d{19}")
+# the possible starts of a json document (NaN and Infinity are accepted by the json module)
+_json_start = re.compile(r'[ \t\n\r]*[{\["tfnNI\-0-9]')
+
 
 def load(text: str, options: Dict[str, str]) -> object:
-    """Load the text as a json object"""
+    """Load the text as a json object
+
+    If orjson is installed it's used to parse the text.
+    Documents it can't load exactly (e.g. NaN or integers over 64 bit) are parsed with the standard json module
+
+    >>> load('{"answer": 42, "big": 123456789012345678901234567890}', {})
+    {'answer': 42, 'big': 123456789012345678901234567890}
+    """
+    if not _json_start.match(text):  # surely not json, no need to start a parser
+        raise LoadingError("Can't decode json")
+    if fast_loads is not None and not _long_integer.search(text):
+        try:
+            return fast_loads(text)
+        except JSONDecodeError:
+            pass  # let the standard parser decide
     try:
         return loads(text)
     except JSONDecodeError as e:
-        raise LoadingError("Can't decode json") from e
\ No newline at end of file
+        raise LoadingError("Can't decode json") from e
@@ -2,12 +2,17 @@ from typing import Dict
 from modularconfig.errors import LoadingError
 
 name = "none"
-aliases = ["null"]
+aliases = ("null",)
+
+_none_words = frozenset({"", "none", "null"})
+_none_spellings = _none_words | {"None", "NONE", "Null", "NULL"}  # the common ones, matched without lowering
 
 
 def load(text: str, options: Dict[str, str]) -> None:
     """If the lowered text is empty, 'none' or 'null' None is returned"""
-    text = text.strip().lower()
-    if text not in {"", "none", "null"}:
+    if text in _none_spellings:  # already clean, no need to copy it
+        return None
+    text = text.strip()
+    if len(text) > 4 or text.lower() not in _none_words:  # long texts are rejected without lowering them
         raise LoadingError("text is not empty, 'none' or 'null'")
     return None
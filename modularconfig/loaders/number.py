@@ -1,20 +1,32 @@
+import re
 from typing import Dict, Union
 from modularconfig.errors import LoadingError
+from .int import integer as _integer
 
 name = "number"
-aliases = ["num"]
+aliases = ("num",)
+
+# a character that can't be in any number (not even in inf, infinity and nan)
+_not_numeric = re.compile(r"[^\d\s+\-._eEjJ()iInNfFtTyYaA]")
 
 
 def load(text: str, options: Dict[str, str]) -> Union[int, float, complex]:
-    """Try to load a number as a int.py, then as a float, then as a complex"""
+    """Try to load a number as a int.py, then as a float, then as a complex
+
+    The type is chosen looking at the text, so only one conversion is tried
+    >>> load(" 42 ", {}), load("4.2e1", {}), load("42j", {}), load("(42)", {})
+    (42, 42.0, 42j, (42+0j))
+    """
+    if _not_numeric.search(text):  # most texts fail here, without trying a conversion
+        raise LoadingError("Can't convert to a number")
     text = text.strip()
+    if _integer.fullmatch(text):
+        convert = int
+    elif text.startswith("(") or "j" in text or "J" in text:  # only complex numbers can have those
+        convert = complex
+    else:
+        convert = float
     try:
-        return int(text)
-    except ValueError as int_err:
-        try:
-            return float(text)
-        except ValueError as float_err:
-            try:
-                return complex(text)
-            except ValueError as complex_err:
-                raise LoadingError("Can't convert to a number") from Exception(int_err, float_err, complex_err)
\ No newline at end of file
+        return convert(text)
+    except ValueError as e:
+        raise LoadingError("Can't convert to a number") from e
@@ -1,18 +1,26 @@
+import builtins
+from functools import lru_cache
 from typing import Dict
 from modularconfig.errors import LoadingError
 
 name = "python"
 
 
+@lru_cache(maxsize=64)
+def _compile(text: str):
+    """Compile a script, so reloading the same script is only executed"""
+    return compile(text, "<string>", "exec")
+
+
 def dangerous_load(text: str, options) -> Dict[str, object]:
     """Load the globals defined in a python script
-    >>> dangerous_load("a=5\\nb=4")
+    >>> dangerous_load("a=5\\nb=4", {})
     {'a': 5, 'b': 4}
     """
-    script_vars = {}
+    script_vars = {"__builtins__": builtins}
     try:
-        exec(text, script_vars)
+        exec(_compile(text), script_vars)
     except Exception as e:
         raise LoadingError("An exception has arise in the loading of the python script") from e
-    del script_vars["__builtins__"]  # deleting buitins
+    script_vars.pop("__builtins__", None)  # deleting buitins, if the script didn't
     return script_vars
@@ -1,36 +1,76 @@
-from typing import Dict
+from typing import Dict, Iterator
 from modularconfig.errors import LoadingError, LoaderMissingError
 
 name = "yaml"
 
-try:
-    import yaml
-except ImportError as e:
-    def load(text: str, options: Dict[str, str]) -> object:
-        """Dummy load function if yaml is not installed"""
+# pyyaml is slow to import, so it's imported at the first yaml file
+_yaml = None
+_SafeLoader = _UnsafeLoader = None
+
+
+def _import_yaml():
+    """Import pyyaml and choose its loaders, raise LoaderMissingError if it is not installed"""
+    global _yaml, _SafeLoader, _UnsafeLoader
+    if _yaml is not None:
+        return _yaml
+    try:
+        import yaml
+    except ImportError as e:
         raise LoaderMissingError("Yaml is not installed on the system") from e
-    dangerous_load = load
-else:
-    def load(text: str, options: Dict[str, str]) -> object:
-        """Safely load a subset of yaml"""
-        try:
-            docs = list(yaml.safe_load_all(text))  # only safe features
-        except yaml.YAMLError as e:
-            raise LoadingError("Can't parse YAML") from e  # must use ValueError
-        if len(docs) == 0:
-            return {}
-        if len(docs) == 1:
-            return docs[0]  # only one document
-        return docs  # leave as a list of documents
-
-    def dangerous_load(text: str, options: Dict[str, str]) -> object:
-        """Load the full yaml specification. This can execute arbitrary code"""
+    try:  # using the libyaml bindings, if pyyaml was built with them
+        from yaml import CSafeLoader as SafeLoader
+    except ImportError:
+        from yaml import SafeLoader
+    # the loader of the whole yaml, python tags included (FullLoader refuses to build objects since pyyaml 5.4)
+    try:
+        from yaml import CUnsafeLoader as UnsafeLoader
+    except ImportError:
         try:
-            docs = list(yaml.full_load_all(text))  # load the full yaml
-        except yaml.YAMLError as e:
-            raise LoadingError("Can't parse YAML") from e  # must use ValueError
-        if len(docs) == 0:
-            return {}
-        if len(docs) == 1:
-            return docs[0]  # only one document
-        return docs  # leave as a list of documents
+            from yaml import UnsafeLoader
+        except ImportError:  # before pyyaml 5.1 the default loader was the unsafe one
+            from yaml import Loader as UnsafeLoader
+    _SafeLoader, _UnsafeLoader = SafeLoader, UnsafeLoader
+    _yaml = yaml  # set last, other threads must not see a half done import
+    return yaml
+
+
+def _load_documents(yaml, text: str, loader) -> object:
+    """Load the documents in the text, returning a single document directly"""
+    try:
+        if "---" not in text and "..." not in text:  # no document markers, it must be a single document
+            doc = yaml.load(text, Loader=loader)
+            if doc is not None:
+                return doc
+            # an empty stream, or a null document: let load_all distinguish them
+        return _first_or_all(yaml.load_all(text, Loader=loader))
+    except yaml.YAMLError as e:
+        raise LoadingError("Can't parse YAML") from e  # must use ValueError
+
+
+def _first_or_all(docs: Iterator[object]) -> object:
+    """Return the only document, or the list of all the documents ({} if there is none)
+
+    >>> _first_or_all(iter([])), _first_or_all(iter([1])), _first_or_all(iter([1, 2, 3]))
+    ({}, 1, [1, 2, 3])
+    """
+    try:
+        first = next(docs)
+    except StopIteration:
+        return {}
+    try:
+        second = next(docs)
+    except StopIteration:
+        return first  # only one document
+    return [first, second, *docs]  # leave as a list of documents
+
+
+def load(text: str, options: Dict[str, str]) -> object:
+    """Safely load a subset of yaml"""
+    yaml = _import_yaml()
+    return _load_documents(yaml, text, _SafeLoader)  # only safe features
+
+
+def dangerous_load(text: str, options: Dict[str, str]) -> object:
+    """Load the full yaml specification. This can execute arbitrary code"""
+    yaml = _import_yaml()
+    return _load_documents(yaml, text, _UnsafeLoader)  # load the full yaml
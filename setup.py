@@ -24,7 +24,8 @@ setup(
     zip_safe=True,
     install_requires=[],
     extras_require={
-        "yaml": ["pyyaml"]
+        "yaml": ["pyyaml"],
+        "fast": ["orjson"]
     },
     packages=['modularconfig', 'modularconfig.loaders'],
     test_suite='tests.test_suite',
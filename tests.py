@@ -1,15 +1,24 @@
 import base64
+import cmath
 import json
+import math
+import pickle
 from itertools import product
-from os import remove, mkdir
-from os.path import join, exists
-from tempfile import NamedTemporaryFile, TemporaryDirectory
+from os import remove, mkdir, stat, close, lseek, ftruncate, write, link, listdir, SEEK_SET, environ
+from os.path import join, exists, isdir, realpath
+from pathlib import Path
+from tempfile import TemporaryDirectory, mkstemp
+from threading import Thread
+from typing import Union
 from unittest import TestCase, defaultTestLoader, skipIf
 
 try:
     import yaml
 except ImportError:
     yaml = None
+else:  # using the libyaml emitters, if pyyaml was built with them
+    SafeDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+    Dumper = getattr(yaml, "CDumper", yaml.Dumper)
 
 import modularconfig
 
@@ -21,33 +30,94 @@ example_dict = {
     }
 }
 example_text = "Hello World"
+# example_dict serialized once, for the tests that write it to a file
+EXAMPLE_JSON = json.dumps(example_dict)
+EXAMPLE_JSON_BYTES = EXAMPLE_JSON.encode()
+EXAMPLE_TEXT_BYTES = example_text.encode()
 new_example_text = "Hello Universe"
+# the tree loaded from the ConfigDir directory
+EXPECTED_DIR_TREE = {"example.txt": example_text, "example.json": example_dict, "Nested": {'nested.json': example_dict}}
 
 missing_file = "/I/Really/Hope/This/File/Does/Not/Exist/On/Any/System/Ever"
+missing_attribute = join(missing_file, "./Foo/Bar")
 
 import random
 
 test_seeds = 100
 
+# the payload of the base64 tests, drawn once
+base64_data = random.Random(test_seeds).getrandbits(8 * 2500).to_bytes(2500, "little")  # randbytes() needs python 3.9
+# encoded as "<>8=" with "<>" as altchars: without validation the misplaced altchars are dropped, leaving "8="
+wrong_base64_data = b"\xfb\xff"
+
+# keep the temporary files in memory, where available
+TMPDIR = "/dev/shm" if isdir("/dev/shm") else None
+
+
+def setUpModule():
+    """Do the one time work (lazy imports, the loading pool), so it is not paid by the first test"""
+    with TemporaryDirectory(dir=TMPDIR) as warm_up:
+        Path(join(warm_up, "warm_up.json")).write_bytes(b"#type: json\n{}")
+        Path(join(warm_up, "warm_up.txt")).write_bytes(EXAMPLE_TEXT_BYTES)
+        if yaml is not None:
+            Path(join(warm_up, "warm_up.yaml")).write_bytes(b"#type: yaml\n{}")
+        modularconfig.get(warm_up)  # more than one file, loaded through the pool
+
+
+def temp_file(data: bytes) -> str:
+    """Create a temporary file with the given content, return its path"""
+    fd, path = mkstemp(dir=TMPDIR)
+    try:
+        write(fd, data)
+    finally:
+        close(fd)
+    return path
+
 
 class DangerousClass:
     def __init__(self):
         self.name = "Exploitable"
 
 
-class SimpleFiles(TestCase):
-    def setUp(self):
-        json_file = NamedTemporaryFile(mode="w", delete=False)
-        json.dump(example_dict, json_file)
-        self.json_file = json_file.name
+class TempFileTestCase(TestCase):
+    """Tests on a single temporary file, created once for the class and rewritten by the tests"""
 
-        text_file = NamedTemporaryFile(mode="w", delete=False)
-        text_file.write(example_text)
-        self.text_file = text_file.name
+    @classmethod
+    def setUpClass(cls):
+        cls.test_fd, cls.test_file = mkstemp(dir=TMPDIR)
 
-    def tearDown(self):
-        remove(self.json_file)
-        remove(self.text_file)
+    @classmethod
+    def tearDownClass(cls):
+        close(cls.test_fd)
+        remove(cls.test_file)
+
+    def rewrite(self, text: Union[str, bytes], encoding: str = "utf-8"):
+        """Replace the content of the test file, encoding the text if needed"""
+        lseek(self.test_fd, 0, SEEK_SET)
+        ftruncate(self.test_fd, 0)
+        write(self.test_fd, text if isinstance(text, bytes) else text.encode(encoding))
+
+
+class SimpleFiles(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.json_file = temp_file(EXAMPLE_JSON_BYTES)
+        cls.text_file = temp_file(EXAMPLE_TEXT_BYTES)
+        # the paths of the attributes the tests look up
+        cls.bar_path = join(cls.json_file, "./Bar")
+        cls.nested_bar_path = join(cls.json_file, "./Nested/bar")
+
+    @classmethod
+    def tearDownClass(cls):
+        remove(cls.json_file)
+        remove(cls.text_file)
+
+    def private_copy(self, file: str) -> str:
+        """Copy a file of the class, for the tests that modify it"""
+        with open(file, "rb") as original:
+            copy = temp_file(original.read())
+        self.addCleanup(remove, copy)
+        return copy
 
     def test_json(self):
         self.assertDictEqual(
@@ -57,11 +127,11 @@ class SimpleFiles(TestCase):
 
     def test_inside_attribute(self):
         self.assertEqual(
-            modularconfig.get(join(self.json_file, "./Bar")),
+            modularconfig.get(self.bar_path),
             example_dict["Bar"]
         )
         self.assertEqual(
-            modularconfig.get(join(self.json_file, "./Nested/bar")),
+            modularconfig.get(self.nested_bar_path),
             example_dict["Nested"]["bar"]
         )
 
@@ -79,51 +149,76 @@ class SimpleFiles(TestCase):
         )
         self.assertRaises(
             modularconfig.ConfigFileNotFoundError,
-            modularconfig.get, join(missing_file, "./Foo/Bar")
+            modularconfig.get, missing_attribute
         )
 
     def test_reload(self):
-        modularconfig.ensure(self.text_file)  # load the file
-        with open(self.text_file, "w") as out:
+        text_file = self.private_copy(self.text_file)
+        modularconfig.ensure(text_file)  # load the file
+        with open(text_file, "w") as out:
             out.write(new_example_text)
         with self.subTest("do nothing"):
-            self.assertEqual(modularconfig.get(self.text_file), example_text)  # nothing has changed
+            self.assertEqual(modularconfig.get(text_file), example_text)  # nothing has changed
         with self.subTest("load again"):
-            modularconfig.ensure(self.text_file)
-            self.assertEqual(modularconfig.get(self.text_file), example_text)  # nothing has changed
+            modularconfig.ensure(text_file)
+            self.assertEqual(modularconfig.get(text_file), example_text)  # nothing has changed
         with self.subTest("reload explicity"):
-            modularconfig.ensure(self.text_file, reload=True)
-            self.assertEqual(modularconfig.get(self.text_file), new_example_text)  # nothing has changed
-
-
-class HeadedFiles(TestCase):
-    def setUp(self):
-        json_in_text_file = NamedTemporaryFile(mode="w", delete=False)
-        json_in_text_file.write("#type: text\n")
-        json.dump(example_dict, json_in_text_file)  # writing valid json
-        self.json_in_text_file = json_in_text_file.name
+            modularconfig.ensure(text_file, reload=True)
+            self.assertEqual(modularconfig.get(text_file), new_example_text)  # nothing has changed
 
-        wrong_headed_file = NamedTemporaryFile(mode="w", delete=False)
-        wrong_headed_file.write("#type: json\n")
-        wrong_headed_file.write(example_text)
-        self.wrong_headed_file = wrong_headed_file.name
+    def test_reload_removed_attribute(self):
+        json_file = self.private_copy(self.json_file)
+        self.assertEqual(
+            modularconfig.get(join(json_file, "./Nested/bar")),
+            example_dict["Nested"]["bar"]
+        )
+        with open(json_file, "w") as out:
+            json.dump({"Nested": {}}, out)
+        modularconfig.ensure(json_file, reload=True)
+        with self.assertRaises(modularconfig.ConfigNotFoundError):
+            modularconfig.get(join(json_file, "./Nested/bar"))
+
+    def test_config_getting_configs(self):
+        dangerous_loaders = modularconfig.loaders.dangerous_loaders
+        self.addCleanup(dangerous_loaders.__setitem__, "python", dangerous_loaders["python"])
+        dangerous_loaders["python"] = True
+        script = f"#type: python\nimport modularconfig\nbar = modularconfig.get({self.nested_bar_path!r})".encode()
+        config_dir = TemporaryDirectory(dir=TMPDIR)
+        self.addCleanup(config_dir.cleanup)
+        Path(join(config_dir.name, "single.py")).write_bytes(script)
+        mkdir(join(config_dir.name, "pooled"))  # more than one file, parsed by the loading pool
+        Path(join(config_dir.name, "pooled", "first.py")).write_bytes(script)
+        Path(join(config_dir.name, "pooled", "second.py")).write_bytes(script)
+        for loaded, configs in (("single.py", ("single.py/bar",)),
+                                ("pooled", ("pooled/first.py/bar", "pooled/second.py/bar"))):
+            with self.subTest(loaded=loaded):
+                loading = Thread(target=modularconfig.ensure, args=(join(config_dir.name, loaded),), daemon=True)
+                loading.start()
+                loading.join(timeout=5)
+                self.assertFalse(loading.is_alive(), "Deadlocked while loading")
+                for config in configs:
+                    self.assertEqual(modularconfig.get(join(config_dir.name, config)), example_dict["Nested"]["bar"])
 
-        strange_header = NamedTemporaryFile(mode="w", delete=False)
-        strange_header.write("#type: unknown\n")
-        strange_header.write(example_text)
-        self.strange_header = strange_header.name
 
-    def tearDown(self):
-        remove(self.json_in_text_file)
-        remove(self.wrong_headed_file)
-        remove(self.strange_header)
+class HeadedFiles(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.json_in_text_file = temp_file(b"#type: text\n" + EXAMPLE_JSON_BYTES)  # writing valid json
+        cls.wrong_headed_file = temp_file(b"#type: json\n" + EXAMPLE_TEXT_BYTES)
+        cls.strange_header = temp_file(b"#type: unknown\n" + EXAMPLE_TEXT_BYTES)
+
+    @classmethod
+    def tearDownClass(cls):
+        remove(cls.json_in_text_file)
+        remove(cls.wrong_headed_file)
+        remove(cls.strange_header)
 
     def test_json_in_text_file(self):
         data = modularconfig.get(self.json_in_text_file)
         self.assertIsInstance(data, str)  # it should be loaded as a string
         self.assertEqual(
             data,
-            json.dumps(example_dict)
+            EXAMPLE_JSON
         )
 
     def test_wrong_headed_file(self):
@@ -143,23 +238,27 @@ class HeadedFiles(TestCase):
 
 
 class ConfigDir(TestCase):
-    def setUp(self):
-        self.dir = TemporaryDirectory()
-        with open(join(self.dir.name, "example.txt"), "w") as out:
-            out.write(example_text)
-        with open(join(self.dir.name, "./example.json"), "w") as out:
-            json.dump(example_dict, out)
-        mkdir(join(self.dir.name, "Nested"))
-        with open(join(self.dir.name, "./Nested/nested.json"), "w") as out:
-            json.dump(example_dict, out)
+    @classmethod
+    def setUpClass(cls):
+        # the tests never modify the directory, it can be built once
+        cls.dir = TemporaryDirectory(dir=TMPDIR)
+        Path(join(cls.dir.name, "example.txt")).write_bytes(EXAMPLE_TEXT_BYTES)
+        Path(join(cls.dir.name, "./example.json")).write_bytes(EXAMPLE_JSON_BYTES)
+        mkdir(join(cls.dir.name, "Nested"))
+        Path(join(cls.dir.name, "./Nested/nested.json")).write_bytes(EXAMPLE_JSON_BYTES)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.dir.cleanup()
 
-    def tearDown(self):
-        self.dir.cleanup()
+    def setUp(self):
+        # some tests move the config directory
+        self.addCleanup(modularconfig.set_config_directory, modularconfig.get_config_directory())
 
     def test_get_dir(self):
         self.assertDictEqual(
             modularconfig.get(self.dir.name),
-            {"example.txt": example_text, "example.json": example_dict, "Nested": {'nested.json': example_dict}}
+            EXPECTED_DIR_TREE
         )
 
     def test_set_config_dir(self):
@@ -206,23 +305,211 @@ class ConfigDir(TestCase):
                 modularconfig.get, "bar"
             )
 
+    def test_config_dir_context_error(self):
+        old_config_dir = modularconfig.get_config_directory()
+        with self.assertRaises(modularconfig.ConfigNotFoundError):
+            with modularconfig.using_config_directory(self.dir.name):
+                modularconfig.get("bar")
+        self.assertEqual(modularconfig.get_config_directory(), old_config_dir)
 
-@skipIf(yaml is None, "No yaml detected")
-class Yaml(TestCase):
+
+class DiskCache(TestCase):
     def setUp(self):
-        safe_yaml = NamedTemporaryFile(mode="w", delete=False)
-        safe_yaml.write("#type: yaml\n")
-        yaml.safe_dump(example_dict, safe_yaml)  # writing valid yaml
-        self.safe_yaml = safe_yaml.name
+        self.dir = TemporaryDirectory(dir=TMPDIR)
+        self.cache_dir = TemporaryDirectory(dir=TMPDIR)
+        self.json_file = join(self.dir.name, "example.json")
+        Path(self.json_file).write_bytes(EXAMPLE_JSON_BYTES)
+        modularconfig.set_disk_cache(True, self.cache_dir.name)
+
+    def tearDown(self):
+        modularconfig.set_disk_cache(False)
+        self.dir.cleanup()
+        self.cache_dir.cleanup()
+
+    def cache_file(self, config_file):
+        return modularconfig.config_manager._cache_file(realpath(config_file))
+
+    def test_cache_created(self):
+        modularconfig.ensure(self.dir.name, reload=True)
+        self.assertTrue(self.cache_file(self.json_file).exists())
+        self.assertListEqual(listdir(self.dir.name), ["example.json"])  # the config directory is untouched
+
+    def test_unwritable_cache_directory(self):
+        for name in ("first.json", "second.json", "third.json"):
+            Path(self.dir.name, name).write_bytes(EXAMPLE_JSON_BYTES)
+        modularconfig.set_disk_cache(True, join(self.json_file, "cache"))  # can't be created
+        with self.assertLogs("modularconfig", "WARNING") as logs:
+            modularconfig.ensure(self.dir.name, reload=True)
+            modularconfig.ensure(self.dir.name, reload=True)
+        self.assertEqual(len(logs.output), 1)
+
+    def test_cache_suffix_config(self):
+        Path(self.dir.name, "example.mcache").write_bytes(EXAMPLE_TEXT_BYTES)
+        for enabled in (True, False):
+            with self.subTest(enabled=enabled):
+                modularconfig.set_disk_cache(enabled, self.cache_dir.name)
+                modularconfig.ensure(self.dir.name, reload=True)
+                self.assertDictEqual(
+                    modularconfig.get(self.dir.name),
+                    {"example.json": example_dict, "example.mcache": example_text}
+                )
+
+    def test_cache_disabled_loader(self):
+        python_file = join(self.dir.name, "config.py")
+        Path(python_file).write_bytes(b"#type: python\nanswer = 42")
+        dangerous_loaders = modularconfig.loaders.dangerous_loaders
+        self.addCleanup(dangerous_loaders.__setitem__, "python", dangerous_loaders["python"])
+        dangerous_loaders["python"] = True
+        modularconfig.ensure(python_file, reload=True)  # writing the cache
+        self.assertEqual(modularconfig.get(join(python_file, "answer")), 42)
+        dangerous_loaders["python"] = False
+        # the same file and cache under a new name, as a new run of the program would find them
+        link(python_file, python_file + "_again")
+        link(self.cache_file(python_file), self.cache_file(python_file + "_again"))
+        self.assertRaises(
+            modularconfig.DisabledLoaderError,
+            modularconfig.get, join(python_file + "_again", "answer")
+        )
+
+    def write_cache(self, config_file, key, content):
+        with open(self.cache_file(config_file), "bw") as fil:
+            pickle.dump(key, fil)
+            pickle.dump(content, fil)
+
+    @staticmethod
+    def cache_key(config_file, signature=None):
+        file_stat = stat(config_file)
+        if signature is None:
+            signature = modularconfig.loaders.loaders_signature()
+        return file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_ctime_ns, file_stat.st_size, signature
+
+    def test_cache_used(self):
+        self.write_cache(self.json_file, self.cache_key(self.json_file), example_text)  # cache with a different content
+        self.assertEqual(modularconfig.get(self.json_file), example_text)
+
+    def test_stale_cache(self):
+        for i, changed in enumerate(("inode", "modification time", "change time", "size")):
+            with self.subTest(changed=changed):
+                json_file = join(self.dir.name, f"stale_{i}.json")  # never loaded before
+                Path(json_file).write_bytes(EXAMPLE_JSON_BYTES)
+                stale_key = list(self.cache_key(json_file))
+                stale_key[i] += 1
+                self.write_cache(json_file, tuple(stale_key), example_text)  # not matching the file
+                self.assertEqual(modularconfig.get(json_file), example_dict)
+
+    def test_cache_other_loaders(self):
+        self.write_cache(self.json_file, self.cache_key(self.json_file, "other loaders"), example_text)
+        self.assertEqual(modularconfig.get(self.json_file), example_dict)
+
+
+    def test_signature_loader_objects(self):
+        class MyLoader:
+            name = "my_signed_loader"
+
+            def __init__(self, value):
+                self.value = value
 
-        unsafe_yaml = NamedTemporaryFile(mode="w", delete=False)
-        unsafe_yaml.write("#type: yaml\n")
-        yaml.dump(DangerousClass(), unsafe_yaml)  # writing yaml that need full loader to open
-        self.unsafe_yaml = unsafe_yaml.name
+            def load(self, text, options):
+                return self.value
+
+        class MyStaticLoader:  # always the same load function
+            name = "my_signed_loader"
+
+            @staticmethod
+            def load(text, options):
+                return 42
+        register_loader = modularconfig.loaders.register_loader
+        register_loader(MyLoader(42))
+        signature = modularconfig.loaders.loaders_signature()
+        with self.subTest("other instance"):
+            register_loader(MyLoader(54))
+            self.assertNotEqual(modularconfig.loaders.loaders_signature(), signature)
+        with self.subTest("version"):
+            register_loader(MyStaticLoader)
+            signature = modularconfig.loaders.loaders_signature()
+            register_loader(MyStaticLoader)
+            self.assertEqual(modularconfig.loaders.loaders_signature(), signature)
+            MyStaticLoader.version = 2
+            register_loader(MyStaticLoader)
+            self.assertNotEqual(modularconfig.loaders.loaders_signature(), signature)
+
+
+class ContentCache(TestCase):
+    def setUp(self):
+        modularconfig.set_content_cache(True)
+        self.content = EXAMPLE_JSON_BYTES
 
     def tearDown(self):
-        remove(self.safe_yaml)
-        remove(self.unsafe_yaml)
+        modularconfig.set_content_cache(False)
+
+    def test_cache_copy(self):
+        data = modularconfig.loaders.load_bytes(self.content)
+        data["Foo"] = "modified"
+        self.assertDictEqual(modularconfig.loaders.load_bytes(self.content), example_dict)
+
+    def test_cache_cleared(self):
+        class MyLoader:
+            name = "my_cached_loader"
+
+            def __init__(self, value):
+                self.value = value
+
+            def load(self, text, options):
+                return self.value
+        content = b"#type: my_cached_loader\nanswer"
+        modularconfig.loaders.register_loader(MyLoader(42))
+        self.assertEqual(modularconfig.loaders.load_bytes(content), 42)
+        modularconfig.loaders.register_loader(MyLoader(54))
+        self.assertEqual(modularconfig.loaders.load_bytes(content), 54)
+
+    def test_python_not_cached(self):
+        dangerous_loaders = modularconfig.loaders.dangerous_loaders
+        content = b"#type: python\nimport os\nvalue = os.environ.get('MODULARCONFIG_TEST_VALUE')"
+        self.addCleanup(dangerous_loaders.__setitem__, "python", dangerous_loaders["python"])
+        dangerous_loaders["python"] = True
+        self.addCleanup(environ.pop, "MODULARCONFIG_TEST_VALUE", None)
+        environ["MODULARCONFIG_TEST_VALUE"] = "first"
+        self.assertEqual(modularconfig.loaders.load_bytes(content)["value"], "first")
+        environ["MODULARCONFIG_TEST_VALUE"] = "second"
+        self.assertEqual(modularconfig.loaders.load_bytes(content)["value"], "second")
+
+    def test_impure_not_cached(self):
+        class CountingLoader:
+            name = "my_counting_loader"
+            pure = False
+            calls = 0
+
+            def load(self, text, options):
+                self.calls += 1
+                return self.calls
+        content = b"#type: my_counting_loader\nanswer"
+        modularconfig.loaders.register_loader(CountingLoader())
+        self.assertEqual(modularconfig.loaders.load_bytes(content), 1)
+        self.assertEqual(modularconfig.loaders.load_bytes(content), 2)
+
+
+@skipIf(yaml is None, "No yaml detected")
+class Yaml(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # writing valid yaml
+        cls.safe_yaml = temp_file(
+            b"#type: yaml\n" + yaml.dump(example_dict, Dumper=SafeDumper, encoding="utf-8")
+        )
+        # writing yaml that need full loader to open
+        cls.unsafe_yaml = temp_file(
+            b"#type: yaml\n" + yaml.dump(DangerousClass(), Dumper=Dumper, encoding="utf-8")
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        remove(cls.safe_yaml)
+        remove(cls.unsafe_yaml)
+
+    def setUp(self):
+        # the tests choose the yaml loader
+        dangerous_loaders = modularconfig.loaders.dangerous_loaders
+        self.addCleanup(dangerous_loaders.__setitem__, "yaml", dangerous_loaders["yaml"])
 
     def test_safe_load(self):
         modularconfig.loaders.dangerous_loaders["yaml"] = False
@@ -234,6 +521,7 @@ class Yaml(TestCase):
     def test_safe_load_unsafe(self):
         modularconfig.loaders.dangerous_loaders["yaml"] = False
         try:
+            modularconfig.ensure(self.unsafe_yaml, reload=True)  # another test could have loaded it
             modularconfig.get(self.unsafe_yaml)
         except ValueError as e:
             self.assertIsInstance(
@@ -245,67 +533,59 @@ class Yaml(TestCase):
 
     def test_load_unsafe(self):
         modularconfig.loaders.dangerous_loaders["yaml"] = True
+        modularconfig.ensure(self.unsafe_yaml, reload=True)  # another test could have tried to load it
         self.assertIsInstance(
             modularconfig.get(self.unsafe_yaml),
             DangerousClass
         )
 
 
-class BasicTypeTests(TestCase):
-    def setUp(self):
-        self.test_file = NamedTemporaryFile(mode="w", delete=False).name
-        self.random = random.Random(test_seeds)
-
-    def tearDown(self) -> None:
-        remove(self.test_file)
+class BasicTypeTests(TempFileTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # the numbers loaded by the tests, drawn once for the class
+        rng = random.Random(test_seeds)
+        cls.int_values = ([0] +
+                          [rng.randint(-10000, 0) for _ in range(5)] +  # negatives
+                          [rng.randint(1, 10000) for _ in range(5)])  # positives
+        cls.float_values = ([0.] +
+                            [(rng.random() - 0.5) * 100 for _ in range(5)] +  # small reals
+                            [(rng.random() - 0.5) * 10e30 for _ in range(5)])  # big ones
+        parts = ([0.] +
+                 [(rng.random() - 0.5) * 100 for _ in range(2)] +
+                 [(rng.random() - 0.5) * 10e30 for _ in range(2)])
+        cls.complex_values = [real + imag * 1j for real, imag in product(parts, repeat=2)]
 
     def test_int(self):
-        for type in ("int", "integer", "number"):
-            for num in ([0] +
-                        [self.random.randint(-10000, 0) for _ in range(5)] +  # negatives
-                        [self.random.randint(1, 10000) for _ in range(5)]):  # positives
-                with self.subTest(type=type, num=num):
-                    with open(self.test_file, "w") as fil:
-                        fil.write(f"#type: {type}\n{num}")
-                    modularconfig.ensure(self.test_file, reload=True)  # we modified it
-                    self.assertEqual(
-                        modularconfig.get(self.test_file),
-                        num
-                    )
+        for type, num in product(("int", "integer", "number"), self.int_values):
+            with self.subTest(type=type, num=num):
+                self.rewrite(f"#type: {type}\n{num}")
+                modularconfig.ensure(self.test_file, reload=True)  # we modified it
+                self.assertEqual(
+                    modularconfig.get(self.test_file),
+                    num
+                )
 
     def test_float(self):
-        for type in ("float", "real", "number"):
-            for num in ([0.] +
-                        [(self.random.random() - 0.5) * 100 for _ in range(5)] +  # small reals
-                        [(self.random.random() - 0.5) * 10e30 for _ in range(5)]):  # big ones
-                with self.subTest(type=type, num=num):
-                    with open(self.test_file, "w") as fil:
-                        fil.write(f"#type: {type}\n{num}")
-                    modularconfig.ensure(self.test_file, reload=True)  # we modified it
-                    self.assertAlmostEqual(
-                        modularconfig.get(self.test_file),
-                        num
-                    )
+        for type, num in product(("float", "real", "number"), self.float_values):
+            with self.subTest(type=type, num=num):
+                self.rewrite(f"#type: {type}\n{num}")
+                modularconfig.ensure(self.test_file, reload=True)  # we modified it
+                loaded = modularconfig.get(self.test_file)
+                self.assertTrue(math.isclose(loaded, num), f"{loaded!r} != {num!r}")
 
     def test_complex(self):
-        for type in ("complex", "number"):
-            for real, imag in product([0.] +
-                                      [(self.random.random() - 0.5) * 100 for _ in range(2)] +
-                                      [(self.random.random() - 0.5) * 10e30 for _ in range(2)], repeat=2):
-                num = real + imag * 1j
-                with self.subTest(type=type, num=num):
-                    with open(self.test_file, "w") as fil:
-                        fil.write(f"#type: {type}\n{num}")
-                    modularconfig.ensure(self.test_file, reload=True)  # we modified it
-                    self.assertAlmostEqual(
-                        modularconfig.get(self.test_file),
-                        num
-                    )
+        for type, num in product(("complex", "number"), self.complex_values):
+            with self.subTest(type=type, num=num):
+                self.rewrite(f"#type: {type}\n{num}")
+                modularconfig.ensure(self.test_file, reload=True)  # we modified it
+                loaded = modularconfig.get(self.test_file)
+                self.assertTrue(cmath.isclose(loaded, num), f"{loaded!r} != {num!r}")
 
     def test_base64(self):
-        data = bytes([self.random.getrandbits(8) for _ in range(0, 2500)])
-        with open(self.test_file, "w", encoding="ascii") as fil:
-            fil.write(f"#type: base64:encoding=ascii \n{base64.b64encode(data).decode('ascii')}")
+        data = base64_data
+        self.rewrite(f"#type: base64:encoding=ascii \n{base64.b64encode(data).decode('ascii')}", encoding="ascii")
         modularconfig.ensure(self.test_file, reload=True)  # we modified it
         self.assertEqual(
             modularconfig.get(self.test_file),
@@ -313,42 +593,47 @@ class BasicTypeTests(TestCase):
         )
 
     def test_base64_options(self):
-        data = bytes([self.random.getrandbits(8) for _ in range(0, 2500)])
-        with open(self.test_file, "w", encoding="ascii") as fil:
-            fil.write(
-                "#type: base64:encoding=ascii;altchars=[]\n"
-                f"{base64.b64encode(data, altchars=b'[]').decode('ascii')}"
-            )
+        data = base64_data
+        self.rewrite(
+            "#type: base64:encoding=ascii;altchars=[]\n"
+            f"{base64.b64encode(data, altchars=b'[]').decode('ascii')}",
+            encoding="ascii"
+        )
         modularconfig.ensure(self.test_file, reload=True)  # we modified it
         self.assertEqual(
             modularconfig.get(self.test_file),
             data
         )
 
+    def test_base64_binary(self):
+        # without an encoding the payload is passed undecoded to the loader
+        for header, altchars in (("#type: base64", None), ("#type: base64:altchars=[]", b"[]")):
+            with self.subTest(header=header):
+                self.rewrite(f"{header}\n".encode("ascii") + base64.b64encode(base64_data, altchars=altchars))
+                modularconfig.ensure(self.test_file, reload=True)  # we modified it
+                self.assertEqual(
+                    modularconfig.get(self.test_file),
+                    base64_data
+                )
+
     def test_base64_wrong_options(self):
-        data = bytes([self.random.getrandbits(8) for _ in range(0, 2500)])
-        with open(self.test_file, "w", encoding="ascii") as fil:
-            fil.write(
-                "#type: base64:encoding=ascii;altchars=[]\n"
-                f"{base64.b64encode(data, altchars=b'<>').decode('ascii')}"
-            )
+        data = wrong_base64_data
+        self.rewrite(
+            "#type: base64:encoding=ascii;altchars=[]\n"
+            f"{base64.b64encode(data, altchars=b'<>').decode('ascii')}",
+            encoding="ascii"
+        )
         self.assertRaises(
             modularconfig.LoadingError,
             modularconfig.ensure, self.test_file, reload=True
         )
 
 
-class Encoding(TestCase):
-    def setUp(self):
-        self.test_file = NamedTemporaryFile(mode="w", delete=False).name
-
-    def tearDown(self) -> None:
-        remove(self.test_file)
+class Encoding(TempFileTestCase):
 
     def test_latin1(self):
         data = "Quì usiamo glì accénti èàìòù"
-        with open(self.test_file, "w", encoding="latin1") as fil:
-            fil.write(f"#type: text: encoding=latin1\n{data}")
+        self.rewrite(f"#type: text: encoding=latin1\n{data}", encoding="latin1")
         modularconfig.ensure(self.test_file, reload=True)  # we modified it
         self.assertEqual(
             modularconfig.get(self.test_file),
@@ -357,20 +642,14 @@ class Encoding(TestCase):
 
     def test_wrong_encoding(self):
         data = "this is chinese: 汉字"
-        with open(self.test_file, "w") as fil:
-            fil.write(f"#type: text: encoding=latin1\n{data}")
+        self.rewrite(f"#type: text: encoding=latin1\n{data}")
         modularconfig.ensure(self.test_file, reload=True)  # we modified it
         self.assertNotEqual(
             modularconfig.get(self.test_file),
             data
         )
 
-class ModularLoaders(TestCase):
-    def setUp(self):
-        self.test_file = NamedTemporaryFile(mode="w", delete=False).name
-
-    def tearDown(self) -> None:
-        remove(self.test_file)
+class ModularLoaders(TempFileTestCase):
 
     def test_add_loader(self):
         class MyLoader:
@@ -384,14 +663,50 @@ class ModularLoaders(TestCase):
                     return "What???"
 
         modularconfig.loaders.register_loader(MyLoader())
-        with open(self.test_file, "w") as fil:
-            fil.write(f"#type: myloader\nanswer")
+        self.rewrite("#type: myloader\nanswer")
         modularconfig.ensure(self.test_file, reload=True)  # we modified it
         self.assertEqual(
             modularconfig.get(self.test_file),
             42
         )
 
+    def test_dangerous_flags(self):
+        class MyLoader:
+            name = "my_flagged_loader"
+
+            def load(self, text, options):
+                return "safe"
+
+            def dangerous_load(self, text, options):
+                return "dangerous"
+        dangerous_loaders = modularconfig.loaders.dangerous_loaders
+        modularconfig.loaders.register_loader(MyLoader())
+        load_func = modularconfig.loaders.loaders["my_flagged_loader"]
+        with self.subTest("is a dict"):
+            self.assertIsInstance(dangerous_loaders, dict)
+            self.assertDictEqual(dangerous_loaders.copy(), dict(dangerous_loaders))
+        with self.subTest("functions taken before the flag change"):
+            dangerous_loaders["my_flagged_loader"] = True
+            self.assertEqual(load_func("answer", {}), "dangerous")
+            del dangerous_loaders["my_flagged_loader"]
+            self.assertEqual(load_func("answer", {}), "safe")
+        with self.subTest("missing flag"):
+            with self.assertRaises(KeyError):
+                del dangerous_loaders["my_flagged_loader"]
+            self.assertNotIn("my_flagged_loader", dangerous_loaders)
+
+    def test_modify_auto_loaders(self):
+        auto_loaders = modularconfig.loaders.auto_loaders
+        self.addCleanup(auto_loaders.__setitem__, slice(None), list(auto_loaders))
+        self.addCleanup(modularconfig.loaders.loaders.pop, "my_auto_loader")
+        self.rewrite("answer")
+        auto_loaders.insert(0, "my_auto_loader")  # not registered yet, skipped
+        modularconfig.ensure(self.test_file, reload=True)
+        self.assertEqual(modularconfig.get(self.test_file), "answer")
+        modularconfig.loaders.loaders["my_auto_loader"] = lambda text, options: 42
+        modularconfig.ensure(self.test_file, reload=True)
+        self.assertEqual(modularconfig.get(self.test_file), 42)
+
     def test_add_dangerous_loader(self):
         class MyLoader:
             def __init__(self):
@@ -401,8 +716,7 @@ class ModularLoaders(TestCase):
                 return "Spooooky"
         modularconfig.loaders.register_loader(MyLoader())
         with self.subTest("Disabled Loader"):
-            with open(self.test_file, "w") as fil:
-                fil.write(f"#type: my_dangerous_loader\nanswer")
+            self.rewrite("#type: my_dangerous_loader\nanswer")
             self.assertRaises(
                 modularconfig.DisabledLoaderError,
                 modularconfig.ensure, self.test_file, reload=True
@@ -430,8 +744,7 @@ class ModularLoaders(TestCase):
                 return "Spooooky"
         modularconfig.loaders.register_loader(MyLoader())
         with self.subTest("Disabled Loader"):
-            with open(self.test_file, "w") as fil:
-                fil.write(f"#type: my_dangerous_with_safe_loader\nanswer")
+            self.rewrite("#type: my_dangerous_with_safe_loader\nanswer")
             modularconfig.loaders.dangerous_loaders["my_dangerous_with_safe_loader"] = False
             modularconfig.ensure(self.test_file, reload=True)  # we modified it
 
@@ -450,6 +763,29 @@ class ModularLoaders(TestCase):
                 "Spooooky"
             )
 
+    def test_replace_dangerous_loader(self):
+        class MyDangerousLoader:
+            name = "my_replaced_loader"
+
+            def dangerous_load(self, text, options):
+                return "Spooooky"
+
+        class MySafeLoader:
+            name = "my_replaced_loader"
+
+            def load(self, text, options):
+                return 42
+        modularconfig.loaders.register_loader(MyDangerousLoader())
+        modularconfig.loaders.register_loader(MySafeLoader())
+        self.assertNotIn("my_replaced_loader", modularconfig.loaders.dangerous_loaders)
+        modularconfig.loaders.dangerous_loaders["my_replaced_loader"] = True  # there is nothing to enable
+        self.rewrite("#type: my_replaced_loader\nanswer")
+        modularconfig.ensure(self.test_file, reload=True)  # we modified it
+        self.assertEqual(
+            modularconfig.get(self.test_file),
+            42
+        )
+
     def test_add_with_aliases(self):
         class MyLoader:
             def __init__(self):
@@ -458,8 +794,7 @@ class ModularLoaders(TestCase):
 
             def load(self, text, options):
                 return "Aliased"
-        with open(self.test_file, "w") as fil:
-            fil.write(f"#type: other_name\nanswer")
+        self.rewrite("#type: other_name\nanswer")
         modularconfig.loaders.register_loader(MyLoader())
         modularconfig.ensure(self.test_file, reload=True)  # we modified it
         self.assertEqual(
@@ -467,7 +802,7 @@ class ModularLoaders(TestCase):
             "Aliased"
         )
 
-class IniFile(TestCase):
+class IniFile(TempFileTestCase):
     ini_file = \
 """[DEFAULT]
 ServerAliveInterval = 45
@@ -484,16 +819,16 @@ User = hg
 Port = 50022
 ForwardX11 = no
 """
-    def setUp(self):
-        self.test_file = NamedTemporaryFile(mode="w", delete=False).name
-
-    def tearDown(self) -> None:
-        remove(self.test_file)
+    # the contents of the tests, encoded once
+    ini_bytes = ini_file.encode()
+    headed_ini_bytes = b"#type: ini\n" + ini_bytes
+    alt_delimiters_ini_bytes = (
+            "#type: ini:delimiters=[\"-\"];comment_prefixes=[\"...\"]\n" +  # marking delimiters
+            ini_file.replace("=", "-").replace("#", "...")  # changing the delimiters
+    ).encode()
 
     def test_loading(self):
-        with open(self.test_file, "w") as fil:
-            fil.write("#type: ini\n")
-            fil.write(self.ini_file)
+        self.rewrite(self.headed_ini_bytes)
         modularconfig.ensure(self.test_file, reload=True)  # we modified it
         self.assertEqual(
             modularconfig.get(join(self.test_file, "./topsecret.server.com/port")),
@@ -501,8 +836,7 @@ ForwardX11 = no
         )
 
     def test_auto_loading(self):
-        with open(self.test_file, "w") as fil:
-            fil.write(self.ini_file)
+        self.rewrite(self.ini_bytes)
         modularconfig.ensure(self.test_file, reload=True)  # we modified it
         self.assertEqual(
             modularconfig.get(join(self.test_file, "./topsecret.server.com/port")),
@@ -510,9 +844,7 @@ ForwardX11 = no
         )
 
     def test_defaults(self):
-        with open(self.test_file, "w") as fil:
-            fil.write("#type: ini\n")
-            fil.write(self.ini_file)
+        self.rewrite(self.headed_ini_bytes)
         modularconfig.ensure(self.test_file, reload=True)  # we modified it
         self.assertEqual(
             modularconfig.get(join(self.test_file, "./topsecret.server.com/ServerAliveInterval")),
@@ -520,9 +852,7 @@ ForwardX11 = no
         )
 
     def test_delimiters(self):
-        with open(self.test_file, "w") as fil:
-            fil.write("#type: ini:delimiters=[\"-\"];comment_prefixes=[\"...\"]\n")  # marking delimiters
-            fil.write(self.ini_file.replace("=", "-").replace("#", "..."))  # changing the delimiters
+        self.rewrite(self.alt_delimiters_ini_bytes)
         modularconfig.ensure(self.test_file, reload=True)  # we modified it
         self.assertEqual(
             modularconfig.get(join(self.test_file, "./topsecret.server.com/port")),
@@ -531,17 +861,13 @@ ForwardX11 = no
 
     def test_flag(self):
         with self.subTest("without_setting"):
-            with open(self.test_file, "w") as fil:
-                fil.write("#type: ini\n")
-                fil.write("""[no_value]\nno_value_flag""")
+            self.rewrite("#type: ini\n[no_value]\nno_value_flag")
             self.assertRaises(
                 modularconfig.LoadingError,
                 modularconfig.ensure, self.test_file, reload=True  # we modified it
             )
         with self.subTest("with_setting"):
-            with open(self.test_file, "w") as fil:
-                fil.write("#type: ini:allow_no_value\n")
-                fil.write("""[no_value]\nno_value_flag""")
+            self.rewrite("#type: ini:allow_no_value\n[no_value]\nno_value_flag")
             modularconfig.ensure(self.test_file, reload=True)  # we modified it
             self.assertEqual(
                 modularconfig.get(join(self.test_file, "./no_value/no_value_flag")),